@@ -0,0 +1,33 @@
+import time
+import orjson
+from fastapi import Request, Response
+from typing import Callable, Optional, Sequence
+from pydantic import BaseModel
+
+# Versions restart at zero with the process, so tag them with the process start time
+_PROCESS_TAG = f"{time.time_ns():x}"
+
+def make_etag(*versions: int) -> str:
+    """Build an ETag from the data versions a response depends on"""
+    return '"' + "-".join([_PROCESS_TAG, *(str(v) for v in versions)]) + '"'
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """Return a 304 response if the client already holds this ETag"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(","))):
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+def cached_list_response(request: Request, key: str, etag: str, load: Callable[[], Sequence[BaseModel]]) -> Response:
+    """Serve a list endpoint, reusing the serialized body for as long as the ETag is unchanged"""
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    
+    serialized = request.app.state.serialized_cache
+    entry = serialized.get(key)
+    if entry is None or entry[0] != etag:
+        entry = (etag, orjson.dumps([model.model_dump() for model in load()],
+                                    option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY))
+        serialized[key] = entry
+    return Response(content=entry[1], media_type="application/json", headers={"ETag": etag})
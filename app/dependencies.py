@@ -0,0 +1,9 @@
+from fastapi import Request
+from .repositories.item_repository import ItemRepository
+from .repositories.recipe_repository import RecipeRepository
+
+def get_item_repo(request: Request) -> ItemRepository:
+    return request.app.state.item_repo
+
+def get_recipe_repo(request: Request) -> RecipeRepository:
+    return request.app.state.recipe_repo
@@ -1,11 +1,49 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from .routers import items, recipes
+from fastapi.responses import ORJSONResponse
+from .routers import admin, items, recipes
+from .repositories.item_repository import ItemRepository
+from .repositories.recipe_repository import RecipeRepository
+from .services.google_sheets_service import GoogleSheetsService
 
-app = FastAPI(title="Game Backend API", version="1.0.0")
+async def refresh_from_sheets(app: FastAPI, sheets: GoogleSheetsService):
+    # Data served from the disk cache may be behind the sheet; refetch only those sheets and swap them in
+    stale = set(sheets.stale_sheets)
+    repos = [repo for repo in (app.state.item_repo, app.state.recipe_repo) if repo.SHEET_NAME in stale]
+    frames = await asyncio.gather(*(sheets.get_sheet_data_async(repo.SHEET_NAME, force_refresh=True) for repo in repos))
+    for repo, df in zip(repos, frames):
+        if df is not None and await asyncio.to_thread(repo.reload, df):
+            print(f"Refreshed {repo.SHEET_NAME} from Google Sheets")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Fetch both sheets concurrently, then load data once and share the repositories across all requests
+    sheets = GoogleSheetsService()
+    items_df, recipes_df = await asyncio.gather(sheets.get_items_data_async(), sheets.get_recipes_data_async())
+    
+    # Sheets that could not be fetched fall back to the local files without a second round of requests
+    app.state.item_repo = ItemRepository(use_google_sheets=items_df is not None, sheet_data=items_df,
+                                         google_sheets_service=sheets)
+    app.state.recipe_repo = RecipeRepository(item_repo=app.state.item_repo, use_google_sheets=recipes_df is not None,
+                                             sheet_data=recipes_df, google_sheets_service=sheets)
+    # Serialized list responses keyed by endpoint, reused while their ETag is unchanged
+    app.state.serialized_cache = {}
+    refresh_task = asyncio.create_task(refresh_from_sheets(app, sheets)) if sheets.stale_sheets else None
+    yield
+    if refresh_task is not None:
+        refresh_task.cancel()
+    # Write out any changes still waiting on the debounce timer
+    app.state.item_repo.flush()
+    app.state.recipe_repo.flush()
+
+# orjson serializes the large item/recipe lists (UUIDs included) in C rather than through the stdlib encoder
+app = FastAPI(title="Game Backend API", version="1.0.0", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Include routers
 app.include_router(items.router)
 app.include_router(recipes.router)
+app.include_router(admin.router)
 
 # Health check endpoint
 @app.get("/health")
@@ -1,8 +1,17 @@
+from functools import lru_cache
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from uuid import UUID
 from .item import Item
 
+# Item ids repeat across recipes and requests, so memoize parsing per id string
+parse_uuid = lru_cache(maxsize=4096)(UUID)
+
+@lru_cache(maxsize=1024)
+def parse_required_items(required_items: str) -> Tuple[UUID, ...]:
+    """Parse a comma-separated list of item UUIDs, memoized on the raw string"""
+    return tuple(parse_uuid(x.strip()) for x in required_items.split(','))
+
 class Recipe(BaseModel):
     id: UUID
     name: str
@@ -0,0 +1,237 @@
+import os
+import threading
+import pandas as pd
+from abc import ABC, abstractmethod
+from pydantic import BaseModel
+from typing import List, Optional, Tuple, Type
+from uuid import UUID
+from ..services.google_sheets_service import GoogleSheetsService
+
+# String forms pydantic accepts for bool fields
+_BOOL_STRINGS = {'true': True, 't': True, 'yes': True, 'y': True, 'on': True, '1': True,
+                 'false': False, 'f': False, 'no': False, 'n': False, 'off': False, '0': False}
+
+def _to_bool(value) -> Optional[bool]:
+    if isinstance(value, str):
+        return _BOOL_STRINGS.get(value.strip().lower())
+    # Covers bools and 0/1 numbers; NaN compares unequal to both
+    if value == 0 or value == 1:
+        return bool(value)
+    return None
+
+class BaseRepository(ABC):
+    """
+    In-memory frame with an id index, buffered inserts and debounced Parquet persistence,
+    shared by the sheet-backed repositories
+    """
+    # Google Sheet backing this repository
+    SHEET_NAME = ""
+    # Model served from this repository; stored columns are kept in its field types
+    MODEL: Type[BaseModel]
+    # Id columns stored as strings, whatever type the source parsed them as
+    ID_COLUMNS: Tuple[str, ...] = ('id',)
+    # Seconds to wait after a mutation before writing, so bursts collapse into one write
+    FLUSH_DELAY = 2.0
+    
+    def __init__(self, excel_file: str, use_google_sheets: bool, sheet_data: Optional[pd.DataFrame],
+                 google_sheets_service: Optional[GoogleSheetsService]):
+        self.excel_file = excel_file
+        self.use_google_sheets = use_google_sheets
+        self.google_sheets_service = (google_sheets_service or GoogleSheetsService()) if use_google_sheets else None
+        self.parquet_file = os.path.splitext(excel_file)[0] + ".parquet"
+        # Mutations only mark the data dirty; a timer coalesces bursts into one write
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._flush_timer: Optional[threading.Timer] = None
+        # Rows created since the last merge into self.df, so inserts avoid copying the whole frame
+        self._pending_rows: List[dict] = []
+        # Bumped on every change to the data, used by the routers as an ETag
+        self._version = 0
+        # Set by the first local mutation; such edits are never written back to the sheet
+        self._modified = False
+        self._load_data(sheet_data)
+        self._normalize_rows()
+        self._after_load()
+        self._reindex()
+    
+    @abstractmethod
+    def _load_data(self, sheet_data: Optional[pd.DataFrame] = None):
+        """Set self.df from the given sheet data, the Google Sheet or the local files"""
+    
+    def _after_load(self):
+        """Hook run on a freshly loaded frame, before it is indexed"""
+    
+    def _after_merge(self):
+        """Hook run after buffered rows have been merged into the frame"""
+    
+    def _cast_ids(self):
+        for col in self.ID_COLUMNS:
+            if col in self.df.columns:
+                self.df[col] = self.df[col].astype(str)
+    
+    def _normalize_rows(self):
+        """
+        Drop rows the model would reject and cast int/bool columns to the field types, so rows
+        can be served with model_construct
+        """
+        valid = pd.Series(True, index=self.df.index)
+        for name, field in self.MODEL.model_fields.items():
+            if name not in self.df.columns or not field.is_required():
+                continue
+            col = self.df[name]
+            # Blank cells turn int columns read from CSV into floats; only whole numbers are valid
+            if field.annotation is int:
+                col = pd.to_numeric(col, errors='coerce')
+                valid &= col.notna() & (col == col.round())
+            elif field.annotation is bool:
+                valid &= col.map(_to_bool).notna()
+            else:
+                valid &= col.notna()
+        if not valid.all():
+            print(f"Skipping {int((~valid).sum())} {self.SHEET_NAME} rows with missing or invalid values")
+            self.df = self.df[valid].reset_index(drop=True)
+        self._cast_dtypes()
+    
+    def _cast_dtypes(self):
+        for name, field in self.MODEL.model_fields.items():
+            if name not in self.df.columns:
+                continue
+            col = self.df[name]
+            if field.annotation is int and col.dtype != 'int64':
+                self.df[name] = pd.to_numeric(col).astype('int64')
+            elif field.annotation is bool and col.dtype != 'bool':
+                self.df[name] = col.map(_to_bool).astype('bool')
+    
+    def _categorize_ids(self):
+        # Categorical ids let isin() and equality filters compare integer codes instead of Python strings
+        if 'id' in self.df.columns:
+            self.df['id'] = self.df['id'].astype(str).astype('category')
+    
+    def _reindex(self):
+        self._categorize_ids()
+        # Cache column order and an id -> row position index so lookups avoid full-frame scans
+        self._cols = tuple(self.df.columns)
+        self._by_id = {v: i for i, v in enumerate(self.df['id'].tolist())} if 'id' in self.df.columns else {}
+    
+    def _materialize(self):
+        if not self._pending_rows:
+            return
+        with self._lock:
+            if self._pending_rows:
+                self.df = pd.concat([self.df, pd.DataFrame(self._pending_rows)], ignore_index=True)
+                self._pending_rows.clear()
+                self._cast_dtypes()
+                self._after_merge()
+                self._categorize_ids()
+                self._cols = tuple(self.df.columns)
+    
+    def _snapshot(self) -> Tuple[pd.DataFrame, Tuple[str, ...]]:
+        # Handlers run on a threadpool; take the frame and its columns together under the lock.
+        # Mutations replace self.df rather than editing it, so the returned frame stays unchanged
+        with self._lock:
+            self._materialize()
+            return self.df, self._cols
+    
+    def exists(self, row_id: UUID) -> bool:
+        """Check whether a row with the given id exists, using the id index only"""
+        return str(row_id) in self._by_id
+    
+    def _row_dict(self, row_id: str) -> Optional[dict]:
+        with self._lock:
+            idx = self._by_id.get(row_id)
+            if idx is None:
+                return None
+            # Rows past the end of the frame are still in the insert buffer
+            n = len(self.df)
+            return dict(self._pending_rows[idx - n]) if idx >= n else self.df.iloc[idx].to_dict()
+    
+    def _append_row(self, row: dict):
+        with self._lock:
+            self._pending_rows.append(row)
+            self._by_id[row['id']] = len(self.df) + len(self._pending_rows) - 1
+            self._mark_dirty()
+    
+    def _replace_row(self, idx: int, row: dict, cells: Optional[dict] = None):
+        # cells holds values such as lists that have to be set one cell at a time rather than through a row
+        with self._lock:
+            self._materialize()
+            # Edit a copy and swap it in, so readers iterating an earlier snapshot never see a half-written row
+            df = self.df.copy()
+            label = df.index[idx]
+            df.loc[label] = pd.Series(row)
+            for col, value in (cells or {}).items():
+                df.at[label, col] = value
+            self.df = df
+            self._cast_dtypes()
+            self._mark_dirty()
+    
+    def _delete_row(self, idx: int):
+        with self._lock:
+            self._materialize()
+            self.df = self.df.drop(self.df.index[idx]).reset_index(drop=True)
+            self._reindex()
+            self._mark_dirty()
+    
+    def reload(self, sheet_data: pd.DataFrame) -> bool:
+        """Replace the in-memory data with freshly fetched sheet data, unless it has local changes"""
+        if sheet_data.empty:
+            return False
+        with self._lock:
+            # Local edits were acknowledged to clients but only live here and in the Parquet file
+            if self._modified:
+                print(f"Skipping reload of {self.SHEET_NAME}: it has local changes the sheet does not")
+                return False
+            self.df = sheet_data
+            self._cast_ids()
+            self._normalize_rows()
+            self._after_load()
+            self._reindex()
+            self._version += 1
+            return True
+    
+    @property
+    def version(self) -> int:
+        return self._version
+    
+    def _mark_dirty(self):
+        self._version += 1
+        self._modified = True
+        self._dirty = True
+        self._schedule_flush()
+    
+    def _schedule_flush(self):
+        with self._lock:
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.FLUSH_DELAY, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+    
+    def flush(self):
+        """Write pending changes to the local Parquet file"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._dirty:
+                return
+            self._materialize()
+            try:
+                self._save_data_fast()
+                self._dirty = False
+            except Exception as e:
+                print(f"Error saving {self.SHEET_NAME} data to {self.parquet_file}: {e}, retrying in {self.FLUSH_DELAY}s")
+                self._schedule_flush()
+    
+    def _save_data_fast(self):
+        self.df.to_parquet(self.parquet_file, index=False, compression="snappy")
+    
+    def export_excel(self) -> str:
+        """Write the current data to the Excel file and return its path"""
+        with self._lock:
+            self._materialize()
+            self._save_data()
+        return self.excel_file
+    
+    def _save_data(self):
+        # Ids are already stored as strings, so the frame can be written without a converted copy
+        self.df.to_excel(self.excel_file, index=False)
@@ -1,122 +1,124 @@
+import os
 import pandas as pd
-from typing import List, Optional
+from typing import Iterable, List, Optional, Set
 from uuid import UUID, uuid4
 from ..models.item import Item, ItemCreate
 from ..services.google_sheets_service import GoogleSheetsService
+from .base_repository import BaseRepository
 
-class ItemRepository:
-    def __init__(self, excel_file: str = "items.xlsx", use_google_sheets: bool = True):
-        self.excel_file = excel_file
-        self.use_google_sheets = use_google_sheets
-        self.google_sheets_service = GoogleSheetsService() if use_google_sheets else None
-        self._load_data()
+# Optional fields whose missing values are stored as None rather than NaN
+OPTIONAL_COLUMNS = ('logo_url', 'logo_prompt')
+
+def _row_to_item(row_dict: dict) -> dict:
+    # Ids are always stored as strings, so they can be parsed directly
+    row_dict['id'] = UUID(row_dict['id'])
+    return row_dict
+
+class ItemRepository(BaseRepository):
+    SHEET_NAME = "Items"
+    MODEL = Item
+    
+    def __init__(self, excel_file: str = "items.xlsx", use_google_sheets: bool = True, sheet_data: Optional[pd.DataFrame] = None,
+                 google_sheets_service: Optional[GoogleSheetsService] = None):
+        super().__init__(excel_file, use_google_sheets, sheet_data, google_sheets_service)
     
-    def _load_data(self):
-        # Try Google Sheets first if enabled
+    def _load_data(self, sheet_data: Optional[pd.DataFrame] = None):
+        # Try Google Sheets first if enabled, reusing data that was already fetched
         if self.use_google_sheets and self.google_sheets_service:
             try:
-                self.df = self.google_sheets_service.get_items_data()
+                self.df = sheet_data if sheet_data is not None else self.google_sheets_service.get_items_data()
                 if self.df is not None and not self.df.empty:
                     print("Loaded items data from Google Sheets")
-                    # Convert string UUIDs back to UUID objects for processing
-                    if 'id' in self.df.columns:
-                        self.df['id'] = self.df['id'].astype(str)
+                    self._cast_ids()
                     return
                 else:
                     print("Google Sheets returned empty data, falling back to local file")
             except Exception as e:
                 print(f"Error loading from Google Sheets: {e}, falling back to local file")
         
-        # Fallback to local Excel file
+        # Fallback to local file, preferring the Parquet snapshot written by flush()
         try:
-            self.df = pd.read_excel(self.excel_file)
-            print(f"Loaded items data from local file: {self.excel_file}")
-            # Convert string UUIDs back to UUID objects for processing
-            if not self.df.empty and 'id' in self.df.columns:
-                self.df['id'] = self.df['id'].astype(str)
+            if os.path.exists(self.parquet_file):
+                self.df = pd.read_parquet(self.parquet_file)
+                print(f"Loaded items data from local file: {self.parquet_file}")
+            else:
+                self.df = pd.read_excel(self.excel_file)
+                print(f"Loaded items data from local file: {self.excel_file}")
+            self._cast_ids()
         except FileNotFoundError:
             print("No local file found, creating empty DataFrame")
             self.df = pd.DataFrame(columns=['id', 'name', 'description', 'type', 'rarity', 'price', 'stackable', 'max_stack', 'logo_prompt', 'logo_url'])
     
-    def _save_data(self):
-        # Convert UUIDs to strings for Excel storage
-        df_to_save = self.df.copy()
-        if not df_to_save.empty and 'id' in df_to_save.columns:
-            df_to_save['id'] = df_to_save['id'].astype(str)
-        df_to_save.to_excel(self.excel_file, index=False)
+    def _fill_optional_none(self):
+        # Convert NaN to None once here so rows can be handed to the model as-is
+        for col in OPTIONAL_COLUMNS:
+            if col in self.df.columns:
+                self.df[col] = self.df[col].astype(object).where(self.df[col].notna(), None)
+    
+    def _after_load(self):
+        self._fill_optional_none()
+    
+    def _after_merge(self):
+        # Merging can introduce NaN for optional columns missing from the loaded data
+        self._fill_optional_none()
     
     def get_all(self) -> List[Item]:
-        items = []
-        for _, row in self.df.iterrows():
-            row_dict = row.to_dict()
-            row_dict['id'] = UUID(str(row_dict['id']))
-            # Handle NaN values for optional fields
-            if pd.isna(row_dict.get('logo_url')):
-                row_dict['logo_url'] = None
-            if pd.isna(row_dict.get('logo_prompt')):
-                row_dict['logo_prompt'] = None
-            items.append(Item(**row_dict))
-        return items
+        df, cols = self._snapshot()
+        dict_ = dict
+        zip_ = zip
+        # Rows come from our own store, so skip validation when building models
+        construct = Item.model_construct
+        return [construct(**_row_to_item(dict_(zip_(cols, row)))) for row in df.itertuples(index=False, name=None)]
     
     def get_by_id(self, item_id: UUID) -> Optional[Item]:
-        filtered = self.df[self.df['id'] == str(item_id)]
-        if filtered.empty:
+        row_dict = self._row_dict(str(item_id))
+        if row_dict is None:
             return None
-        row_dict = filtered.iloc[0].to_dict()
-        row_dict['id'] = UUID(str(row_dict['id']))
-        # Handle NaN values for optional fields
-        if pd.isna(row_dict.get('logo_url')):
-            row_dict['logo_url'] = None
-        if pd.isna(row_dict.get('logo_prompt')):
-            row_dict['logo_prompt'] = None
-        return Item(**row_dict)
+        return Item.model_construct(**_row_to_item(row_dict))
     
     def get_by_ids(self, item_ids: List[UUID]) -> List[Item]:
+        df, cols = self._snapshot()
         str_ids = [str(item_id) for item_id in item_ids]
-        filtered = self.df[self.df['id'].isin(str_ids)]
-        items = []
-        for _, row in filtered.iterrows():
-            row_dict = row.to_dict()
-            row_dict['id'] = UUID(str(row_dict['id']))
-            # Handle NaN values for optional fields
-            if pd.isna(row_dict.get('logo_url')):
-                row_dict['logo_url'] = None
-            if pd.isna(row_dict.get('logo_prompt')):
-                row_dict['logo_prompt'] = None
-            items.append(Item(**row_dict))
-        return items
+        filtered = df[df['id'].isin(str_ids)]
+        dict_ = dict
+        zip_ = zip
+        # Rows come from our own store, so skip validation when building models
+        construct = Item.model_construct
+        return [construct(**_row_to_item(dict_(zip_(cols, row)))) for row in filtered.itertuples(index=False, name=None)]
+    
+    def missing(self, item_ids: Iterable[UUID]) -> Set[UUID]:
+        """Return the ids that do not belong to any item, checked against the id index only"""
+        by_id = self._by_id
+        return {item_id for item_id in item_ids if str(item_id) not in by_id}
     
     def create(self, item: ItemCreate) -> Item:
         new_id = uuid4()
         new_item_dict = item.dict()
         new_item_dict['id'] = str(new_id)
         
-        new_row = pd.DataFrame([new_item_dict])
-        self.df = pd.concat([self.df, new_row], ignore_index=True)
-        self._save_data()
+        self._append_row(dict(new_item_dict))
         
         new_item_dict['id'] = new_id
-        return Item(**new_item_dict)
+        return Item.model_construct(**new_item_dict)
     
     def update(self, item_id: UUID, item: ItemCreate) -> Optional[Item]:
         str_id = str(item_id)
-        if str_id not in self.df['id'].values:
-            return None
-        
         item_dict = item.dict()
         item_dict['id'] = str_id
         
-        self.df.loc[self.df['id'] == str_id] = pd.Series(item_dict)
-        self._save_data()
+        with self._lock:
+            idx = self._by_id.get(str_id)
+            if idx is None:
+                return None
+            self._replace_row(idx, item_dict)
         
         item_dict['id'] = item_id
-        return Item(**item_dict)
+        return Item.model_construct(**item_dict)
     
     def delete(self, item_id: UUID) -> bool:
-        str_id = str(item_id)
-        if str_id not in self.df['id'].values:
-            return False
-        
-        self.df = self.df[self.df['id'] != str_id]
-        self._save_data()
-        return True 
\ No newline at end of file
+        with self._lock:
+            idx = self._by_id.get(str(item_id))
+            if idx is None:
+                return False
+            self._delete_row(idx)
+            return True 
\ No newline at end of file
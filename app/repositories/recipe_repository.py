@@ -1,93 +1,130 @@
+import os
 import pandas as pd
 from typing import List, Optional
 from uuid import UUID, uuid4
-from ..models.recipe import Recipe, RecipeCreate, RecipeWithDetails
+from ..models.recipe import Recipe, RecipeCreate, RecipeWithDetails, parse_uuid
 from .item_repository import ItemRepository
 from ..services.google_sheets_service import GoogleSheetsService
+from .base_repository import BaseRepository
 
-class RecipeRepository:
-    def __init__(self, excel_file: str = "recipes.xlsx", item_repo: ItemRepository = None, use_google_sheets: bool = True):
-        self.excel_file = excel_file
-        self.use_google_sheets = use_google_sheets
-        self.google_sheets_service = GoogleSheetsService() if use_google_sheets else None
-        self.item_repo = item_repo or ItemRepository(use_google_sheets=use_google_sheets)
-        self._load_data()
+# Internal column holding required_items split into a list of id strings; required_items stays the source of truth
+REQUIRED_ITEMS_LIST = 'required_items_list'
+
+def _row_to_recipe(row_dict: dict) -> dict:
+    row_dict.pop(REQUIRED_ITEMS_LIST, None)
+    # Ids are always stored as strings, so they can be parsed directly
+    row_dict['id'] = UUID(row_dict['id'])
+    row_dict['result_item_id'] = parse_uuid(row_dict['result_item_id'])
+    return row_dict
+
+def _split_required(required_items) -> List[str]:
+    # Missing values (NaN) have no required items
+    if not isinstance(required_items, str):
+        return []
+    return [x.strip() for x in required_items.split(',')]
+
+class RecipeRepository(BaseRepository):
+    SHEET_NAME = "Recipes"
+    MODEL = Recipe
+    ID_COLUMNS = ('id', 'result_item_id')
     
-    def _load_data(self):
-        # Try Google Sheets first if enabled
+    def __init__(self, excel_file: str = "recipes.xlsx", item_repo: ItemRepository = None, use_google_sheets: bool = True, sheet_data: Optional[pd.DataFrame] = None,
+                 google_sheets_service: Optional[GoogleSheetsService] = None):
+        super().__init__(excel_file, use_google_sheets, sheet_data, google_sheets_service)
+        self.item_repo = item_repo or ItemRepository(use_google_sheets=use_google_sheets, google_sheets_service=self.google_sheets_service)
+    
+    def _load_data(self, sheet_data: Optional[pd.DataFrame] = None):
+        # Try Google Sheets first if enabled, reusing data that was already fetched
         if self.use_google_sheets and self.google_sheets_service:
             try:
-                self.df = self.google_sheets_service.get_recipes_data()
+                self.df = sheet_data if sheet_data is not None else self.google_sheets_service.get_recipes_data()
                 if self.df is not None and not self.df.empty:
                     print("Loaded recipes data from Google Sheets")
-                    # Convert string UUIDs back to UUID objects for processing
-                    if 'id' in self.df.columns:
-                        self.df['id'] = self.df['id'].astype(str)
-                    if 'result_item_id' in self.df.columns:
-                        self.df['result_item_id'] = self.df['result_item_id'].astype(str)
+                    self._cast_ids()
                     return
                 else:
                     print("Google Sheets returned empty recipes data, falling back to local file")
             except Exception as e:
                 print(f"Error loading recipes from Google Sheets: {e}, falling back to local file")
         
-        # Fallback to local Excel file
+        # Fallback to local file, preferring the Parquet snapshot written by flush()
         try:
-            self.df = pd.read_excel(self.excel_file)
-            print(f"Loaded recipes data from local file: {self.excel_file}")
-            # Convert string UUIDs back to UUID objects for processing
-            if not self.df.empty:
-                if 'id' in self.df.columns:
-                    self.df['id'] = self.df['id'].astype(str)
-                if 'result_item_id' in self.df.columns:
-                    self.df['result_item_id'] = self.df['result_item_id'].astype(str)
+            if os.path.exists(self.parquet_file):
+                self.df = pd.read_parquet(self.parquet_file)
+                print(f"Loaded recipes data from local file: {self.parquet_file}")
+            else:
+                self.df = pd.read_excel(self.excel_file)
+                print(f"Loaded recipes data from local file: {self.excel_file}")
+            self._cast_ids()
         except FileNotFoundError:
             print("No local recipes file found, creating empty DataFrame")
             self.df = pd.DataFrame(columns=['id', 'name', 'result_item_id', 'result_quantity', 
                                           'required_items', 'required_quantities', 
                                           'crafting_time', 'experience_gain'])
     
+    def _split_required_items(self):
+        # Tokenize required_items once per load instead of on every request
+        if 'required_items' in self.df.columns:
+            self.df[REQUIRED_ITEMS_LIST] = self.df['required_items'].map(_split_required)
+        else:
+            self.df[REQUIRED_ITEMS_LIST] = [[] for _ in range(len(self.df))]
+    
+    def _after_load(self):
+        self._split_required_items()
+    
     def _save_data(self):
-        # Convert UUIDs to strings for Excel storage
-        df_to_save = self.df.copy()
-        if not df_to_save.empty:
-            if 'id' in df_to_save.columns:
-                df_to_save['id'] = df_to_save['id'].astype(str)
-            if 'result_item_id' in df_to_save.columns:
-                df_to_save['result_item_id'] = df_to_save['result_item_id'].astype(str)
-        df_to_save.to_excel(self.excel_file, index=False)
+        # Ids are already stored as strings, so the frame can be written without a converted copy;
+        # the derived list column is left out since required_items already holds the same data
+        columns = [c for c in self.df.columns if c != REQUIRED_ITEMS_LIST]
+        self.df.to_excel(self.excel_file, index=False, columns=columns)
     
     def get_all(self) -> List[Recipe]:
-        recipes = []
-        for _, row in self.df.iterrows():
-            row_dict = row.to_dict()
-            row_dict['id'] = UUID(str(row_dict['id']))
-            row_dict['result_item_id'] = UUID(str(row_dict['result_item_id']))
-            recipes.append(Recipe(**row_dict))
-        return recipes
+        df, cols = self._snapshot()
+        dict_ = dict
+        zip_ = zip
+        # Rows come from our own store, so skip validation when building models
+        construct = Recipe.model_construct
+        return [construct(**_row_to_recipe(dict_(zip_(cols, row)))) for row in df.itertuples(index=False, name=None)]
     
     def get_by_id(self, recipe_id: UUID) -> Optional[Recipe]:
-        filtered = self.df[self.df['id'] == str(recipe_id)]
-        if filtered.empty:
+        row_dict = self._row_dict(str(recipe_id))
+        if row_dict is None:
             return None
-        row_dict = filtered.iloc[0].to_dict()
-        row_dict['id'] = UUID(str(row_dict['id']))
-        row_dict['result_item_id'] = UUID(str(row_dict['result_item_id']))
-        return Recipe(**row_dict)
+        return Recipe.model_construct(**_row_to_recipe(row_dict))
     
     def get_by_id_with_details(self, recipe_id: UUID) -> Optional[RecipeWithDetails]:
-        recipe = self.get_by_id(recipe_id)
-        if not recipe:
+        row_dict = self._row_dict(str(recipe_id))
+        if row_dict is None:
             return None
+        # Read the split list from the same row before it is dropped by _row_to_recipe
+        required = row_dict[REQUIRED_ITEMS_LIST]
+        recipe = Recipe.model_construct(**_row_to_recipe(row_dict))
+        required_item_ids = [parse_uuid(x) for x in required]
+        
+        # Fetch result and required items with a single lookup
+        items = self.item_repo.get_by_ids([recipe.result_item_id, *required_item_ids])
+        by_id = {item.id: item for item in items}
         
-        # Get result item details
-        result_item = self.item_repo.get_by_id(recipe.result_item_id)
+        return self._with_details(recipe, required_item_ids, by_id)
+    
+    def get_all_with_details(self) -> List[RecipeWithDetails]:
+        with self._lock:
+            recipes = self.get_all()
+            required_lists = self.df[REQUIRED_ITEMS_LIST].tolist()
         
-        # Get required items details
-        required_item_ids = [UUID(x.strip()) for x in recipe.required_items.split(',')]
-        required_items = self.item_repo.get_by_ids(required_item_ids)
+        # Collect every referenced item up front so the item repository is queried once
+        parsed = [[parse_uuid(x) for x in required] for required in required_lists]
+        all_needed = {recipe.result_item_id for recipe in recipes}
+        all_needed.update(item_id for required_item_ids in parsed for item_id in required_item_ids)
         
-        return RecipeWithDetails(
+        items = self.item_repo.get_by_ids(list(all_needed))
+        by_id = {item.id: item for item in items}
+        
+        return [self._with_details(recipe, parsed[i], by_id) for i, recipe in enumerate(recipes)]
+    
+    @staticmethod
+    def _with_details(recipe: Recipe, required_item_ids: List[UUID], by_id: dict) -> RecipeWithDetails:
+        return RecipeWithDetails.model_construct(
             id=recipe.id,
             name=recipe.name,
             result_item_id=recipe.result_item_id,
@@ -96,54 +133,42 @@ class RecipeRepository:
             required_quantities=recipe.required_quantities,
             crafting_time=recipe.crafting_time,
             experience_gain=recipe.experience_gain,
-            result_item=result_item,
-            required_item_details=required_items
+            result_item=by_id.get(recipe.result_item_id),
+            required_item_details=[by_id[item_id] for item_id in required_item_ids if item_id in by_id]
         )
     
-    def get_all_with_details(self) -> List[RecipeWithDetails]:
-        recipes = self.get_all()
-        detailed_recipes = []
-        for recipe in recipes:
-            detailed = self.get_by_id_with_details(recipe.id)
-            if detailed:
-                detailed_recipes.append(detailed)
-        return detailed_recipes
-    
     def create(self, recipe: RecipeCreate) -> Recipe:
         new_id = uuid4()
         new_recipe_dict = recipe.dict()
         new_recipe_dict['id'] = str(new_id)
         new_recipe_dict['result_item_id'] = str(recipe.result_item_id)
         
-        new_row = pd.DataFrame([new_recipe_dict])
-        self.df = pd.concat([self.df, new_row], ignore_index=True)
-        self._save_data()
+        self._append_row({**new_recipe_dict, REQUIRED_ITEMS_LIST: _split_required(recipe.required_items)})
         
         new_recipe_dict['id'] = new_id
         new_recipe_dict['result_item_id'] = recipe.result_item_id
-        return Recipe(**new_recipe_dict)
+        return Recipe.model_construct(**new_recipe_dict)
     
     def update(self, recipe_id: UUID, recipe: RecipeCreate) -> Optional[Recipe]:
         str_id = str(recipe_id)
-        if str_id not in self.df['id'].values:
-            return None
-        
         recipe_dict = recipe.dict()
         recipe_dict['id'] = str_id
         recipe_dict['result_item_id'] = str(recipe.result_item_id)
         
-        self.df.loc[self.df['id'] == str_id] = pd.Series(recipe_dict)
-        self._save_data()
+        with self._lock:
+            idx = self._by_id.get(str_id)
+            if idx is None:
+                return None
+            self._replace_row(idx, recipe_dict, {REQUIRED_ITEMS_LIST: _split_required(recipe.required_items)})
         
         recipe_dict['id'] = recipe_id
         recipe_dict['result_item_id'] = recipe.result_item_id
-        return Recipe(**recipe_dict)
+        return Recipe.model_construct(**recipe_dict)
     
     def delete(self, recipe_id: UUID) -> bool:
-        str_id = str(recipe_id)
-        if str_id not in self.df['id'].values:
-            return False
-        
-        self.df = self.df[self.df['id'] != str_id]
-        self._save_data()
-        return True 
\ No newline at end of file
+        with self._lock:
+            idx = self._by_id.get(str(recipe_id))
+            if idx is None:
+                return False
+            self._delete_row(idx)
+            return True 
\ No newline at end of file
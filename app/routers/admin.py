@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Depends
+from ..repositories.item_repository import ItemRepository
+from ..repositories.recipe_repository import RecipeRepository
+from ..dependencies import get_item_repo, get_recipe_repo
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+@router.post("/export")
+def export_excel(item_repo: ItemRepository = Depends(get_item_repo),
+                 recipe_repo: RecipeRepository = Depends(get_recipe_repo)):
+    files = [item_repo.export_excel(), recipe_repo.export_excel()]
+    return {"message": "Data exported successfully", "files": files}
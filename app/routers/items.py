@@ -1,38 +1,45 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from typing import List
 from uuid import UUID
 from ..models.item import Item, ItemCreate
 from ..repositories.item_repository import ItemRepository
+from ..dependencies import get_item_repo
+from ..caching import cached_list_response, make_etag, not_modified
 
 router = APIRouter(prefix="/items", tags=["items"])
 
-# Initialize repository with Google Sheets enabled
-item_repo = ItemRepository(use_google_sheets=True)
-
 @router.get("/", response_model=List[Item])
-async def get_all_items():
-    return item_repo.get_all()
+def get_all_items(request: Request, item_repo: ItemRepository = Depends(get_item_repo)):
+    return cached_list_response(request, "items", make_etag(item_repo.version), item_repo.get_all)
 
 @router.get("/{item_id}", response_model=Item)
-async def get_item(item_id: UUID):
+def get_item(item_id: UUID, request: Request, response: Response, item_repo: ItemRepository = Depends(get_item_repo)):
+    # The ETag covers the whole repository, so a missing id must 404 before it can match
+    if not item_repo.exists(item_id):
+        raise HTTPException(status_code=404, detail="Item not found")
+    etag = make_etag(item_repo.version)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
     item = item_repo.get_by_id(item_id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
+    response.headers["ETag"] = etag
     return item
 
 @router.post("/", response_model=Item)
-async def create_item(item: ItemCreate):
+def create_item(item: ItemCreate, item_repo: ItemRepository = Depends(get_item_repo)):
     return item_repo.create(item)
 
 @router.put("/{item_id}", response_model=Item)
-async def update_item(item_id: UUID, item: ItemCreate):
+def update_item(item_id: UUID, item: ItemCreate, item_repo: ItemRepository = Depends(get_item_repo)):
     updated_item = item_repo.update(item_id, item)
     if not updated_item:
         raise HTTPException(status_code=404, detail="Item not found")
     return updated_item
 
 @router.delete("/{item_id}")
-async def delete_item(item_id: UUID):
+def delete_item(item_id: UUID, item_repo: ItemRepository = Depends(get_item_repo)):
     success = item_repo.delete(item_id)
     if not success:
         raise HTTPException(status_code=404, detail="Item not found")
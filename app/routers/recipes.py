@@ -1,63 +1,71 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from typing import List
 from uuid import UUID
-from ..models.recipe import Recipe, RecipeCreate, RecipeWithDetails
+from ..models.recipe import Recipe, RecipeCreate, RecipeWithDetails, parse_required_items
 from ..repositories.recipe_repository import RecipeRepository
 from ..repositories.item_repository import ItemRepository
+from ..dependencies import get_item_repo, get_recipe_repo
+from ..caching import cached_list_response, make_etag, not_modified
 
 router = APIRouter(prefix="/recipes", tags=["recipes"])
 
-# Initialize repositories with Google Sheets enabled
-item_repo = ItemRepository(use_google_sheets=True)
-recipe_repo = RecipeRepository(item_repo=item_repo, use_google_sheets=True)
+def _verify_items_exist(recipe: RecipeCreate, item_repo: ItemRepository):
+    # Check the result item and every required item in a single pass over the id index
+    missing = item_repo.missing([recipe.result_item_id, *parse_required_items(recipe.required_items)])
+    if recipe.result_item_id in missing:
+        raise HTTPException(status_code=400, detail="Result item not found")
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Required items not found: {', '.join(sorted(map(str, missing)))}")
 
 @router.get("/", response_model=List[Recipe])
-async def get_all_recipes():
-    return recipe_repo.get_all()
+def get_all_recipes(request: Request, recipe_repo: RecipeRepository = Depends(get_recipe_repo)):
+    return cached_list_response(request, "recipes", make_etag(recipe_repo.version), recipe_repo.get_all)
 
 @router.get("/detailed", response_model=List[RecipeWithDetails])
-async def get_all_recipes_detailed():
-    return recipe_repo.get_all_with_details()
+def get_all_recipes_detailed(request: Request, recipe_repo: RecipeRepository = Depends(get_recipe_repo)):
+    # Details embed items, so the response also changes with the item data
+    etag = make_etag(recipe_repo.version, recipe_repo.item_repo.version)
+    return cached_list_response(request, "recipes_detailed", etag, recipe_repo.get_all_with_details)
 
 @router.get("/{recipe_id}", response_model=Recipe)
-async def get_recipe(recipe_id: UUID):
+def get_recipe(recipe_id: UUID, request: Request, response: Response, recipe_repo: RecipeRepository = Depends(get_recipe_repo)):
+    # The ETag covers the whole repository, so a missing id must 404 before it can match
+    if not recipe_repo.exists(recipe_id):
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    etag = make_etag(recipe_repo.version)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
     recipe = recipe_repo.get_by_id(recipe_id)
     if not recipe:
         raise HTTPException(status_code=404, detail="Recipe not found")
+    response.headers["ETag"] = etag
     return recipe
 
 @router.get("/{recipe_id}/detailed", response_model=RecipeWithDetails)
-async def get_recipe_detailed(recipe_id: UUID):
+def get_recipe_detailed(recipe_id: UUID, request: Request, response: Response, recipe_repo: RecipeRepository = Depends(get_recipe_repo)):
+    # The ETag covers the whole repository, so a missing id must 404 before it can match
+    if not recipe_repo.exists(recipe_id):
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    etag = make_etag(recipe_repo.version, recipe_repo.item_repo.version)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
     recipe = recipe_repo.get_by_id_with_details(recipe_id)
     if not recipe:
         raise HTTPException(status_code=404, detail="Recipe not found")
+    response.headers["ETag"] = etag
     return recipe
 
 @router.post("/", response_model=Recipe)
-async def create_recipe(recipe: RecipeCreate):
-    # Verify result item exists
-    if not item_repo.get_by_id(recipe.result_item_id):
-        raise HTTPException(status_code=400, detail="Result item not found")
-    
-    # Verify required items exist
-    required_item_ids = [UUID(x.strip()) for x in recipe.required_items.split(',')]
-    for item_id in required_item_ids:
-        if not item_repo.get_by_id(item_id):
-            raise HTTPException(status_code=400, detail=f"Required item {item_id} not found")
+def create_recipe(recipe: RecipeCreate, recipe_repo: RecipeRepository = Depends(get_recipe_repo), item_repo: ItemRepository = Depends(get_item_repo)):
+    _verify_items_exist(recipe, item_repo)
     
     return recipe_repo.create(recipe)
 
 @router.put("/{recipe_id}", response_model=Recipe)
-async def update_recipe(recipe_id: UUID, recipe: RecipeCreate):
-    # Verify result item exists
-    if not item_repo.get_by_id(recipe.result_item_id):
-        raise HTTPException(status_code=400, detail="Result item not found")
-    
-    # Verify required items exist
-    required_item_ids = [UUID(x.strip()) for x in recipe.required_items.split(',')]
-    for item_id in required_item_ids:
-        if not item_repo.get_by_id(item_id):
-            raise HTTPException(status_code=400, detail=f"Required item {item_id} not found")
+def update_recipe(recipe_id: UUID, recipe: RecipeCreate, recipe_repo: RecipeRepository = Depends(get_recipe_repo), item_repo: ItemRepository = Depends(get_item_repo)):
+    _verify_items_exist(recipe, item_repo)
     
     updated_recipe = recipe_repo.update(recipe_id, recipe)
     if not updated_recipe:
@@ -65,7 +73,7 @@ async def update_recipe(recipe_id: UUID, recipe: RecipeCreate):
     return updated_recipe
 
 @router.delete("/{recipe_id}")
-async def delete_recipe(recipe_id: UUID):
+def delete_recipe(recipe_id: UUID, recipe_repo: RecipeRepository = Depends(get_recipe_repo)):
     success = recipe_repo.delete(recipe_id)
     if not success:
         raise HTTPException(status_code=404, detail="Recipe not found")
@@ -1,20 +1,30 @@
+import asyncio
+import os
+import time
 import pandas as pd
 import gspread
+import httpx
 import requests
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Set, Tuple
 from io import StringIO
+from pathlib import Path
 
 class GoogleSheetsService:
-    def __init__(self):
+    def __init__(self, ttl: float = 300.0, cache_dir: str = ".cache", disk_ttl: float = 3600.0):
         self.spreadsheet_id = "1RXXaxbOCtlsOdPDTOhL5R4Wjnrct1jBOaueNSj10Rys"
         self.base_url = f"https://docs.google.com/spreadsheets/d/{self.spreadsheet_id}/export"
+        # Recently fetched sheets keyed by sheet name, to stay under Google's rate limits
+        self._cache: Dict[str, Tuple[float, pd.DataFrame]] = {}
+        self._ttl = ttl
+        # Last successful fetch of each sheet, kept on disk so restarts can skip the HTTP round trip
+        self.cache_dir = Path(cache_dir)
+        self._disk_ttl = disk_ttl
+        # Sheets served from the disk cache that have not been refetched since
+        self.stale_sheets: Set[str] = set()
         
-    def read_sheet_as_csv(self, sheet_name: str) -> Optional[pd.DataFrame]:
-        """
-        Read a Google Sheet as CSV using the public export URL with multiple fallback methods
-        """
+    def _csv_urls(self, sheet_name: str) -> List[str]:
         # Try different URL formats for public Google Sheets
-        url_formats = [
+        return [
             # Standard CSV export format
             f"https://docs.google.com/spreadsheets/d/{self.spreadsheet_id}/export?format=csv&gid=0",
             # Alternative public URL format
@@ -22,51 +32,62 @@ class GoogleSheetsService:
             # Direct public CSV link
             f"https://docs.google.com/spreadsheets/d/{self.spreadsheet_id}/pub?gid=0&single=true&output=csv",
         ]
+    
+    def _parse_csv_response(self, sheet_name: str, fmt: int, status_code: int, text: str) -> Optional[pd.DataFrame]:
+        """
+        Parse a CSV export response, returning None if it holds no usable data
+        """
+        # Don't raise for status immediately, check content first
+        if status_code != 200:
+            print(f"HTTP {status_code} for '{sheet_name}' with URL format {fmt}")
+            return None
         
-        for i, csv_url in enumerate(url_formats):
+        # Check if response has actual CSV content (not HTML error page)
+        content = text.strip()
+        if not content:
+            print(f"Empty response for '{sheet_name}' with URL format {fmt}")
+            return None
+            
+        # Check if it's an HTML error page
+        if content.startswith('<!DOCTYPE html>') or content.startswith('<html'):
+            print(f"Received HTML error page for '{sheet_name}' with URL format {fmt}")
+            return None
+        
+        # Try to parse as CSV
+        try:
+            csv_data = StringIO(content)
+            df = pd.read_csv(csv_data)
+            
+            # Clean up empty rows and columns
+            df = df.dropna(how='all').dropna(axis=1, how='all')
+            
+            # Check if DataFrame has meaningful data
+            if df.empty or len(df.columns) == 0:
+                print(f"No meaningful data in '{sheet_name}' with URL format {fmt}")
+                return None
+                
+            print(f"Successfully read Google Sheet '{sheet_name}' with shape {df.shape} using URL format {fmt}")
+            return df
+            
+        except pd.errors.EmptyDataError:
+            print(f"Empty CSV data for '{sheet_name}' with URL format {fmt}")
+            return None
+        except Exception as csv_error:
+            print(f"CSV parsing error for '{sheet_name}' with URL format {fmt}: {csv_error}")
+            return None
+    
+    def read_sheet_as_csv(self, sheet_name: str) -> Optional[pd.DataFrame]:
+        """
+        Read a Google Sheet as CSV using the public export URL with multiple fallback methods
+        """
+        for i, csv_url in enumerate(self._csv_urls(sheet_name)):
             try:
                 print(f"Trying URL format {i+1} for '{sheet_name}': {csv_url}")
                 
                 response = requests.get(csv_url, timeout=10)
-                
-                # Don't raise for status immediately, check content first
-                if response.status_code == 200:
-                    # Check if response has actual CSV content (not HTML error page)
-                    content = response.text.strip()
-                    if not content:
-                        print(f"Empty response for '{sheet_name}' with URL format {i+1}")
-                        continue
-                        
-                    # Check if it's an HTML error page
-                    if content.startswith('<!DOCTYPE html>') or content.startswith('<html'):
-                        print(f"Received HTML error page for '{sheet_name}' with URL format {i+1}")
-                        continue
-                    
-                    # Try to parse as CSV
-                    try:
-                        csv_data = StringIO(content)
-                        df = pd.read_csv(csv_data)
-                        
-                        # Clean up empty rows and columns
-                        df = df.dropna(how='all').dropna(axis=1, how='all')
-                        
-                        # Check if DataFrame has meaningful data
-                        if df.empty or len(df.columns) == 0:
-                            print(f"No meaningful data in '{sheet_name}' with URL format {i+1}")
-                            continue
-                            
-                        print(f"Successfully read Google Sheet '{sheet_name}' with shape {df.shape} using URL format {i+1}")
-                        return df
-                        
-                    except pd.errors.EmptyDataError:
-                        print(f"Empty CSV data for '{sheet_name}' with URL format {i+1}")
-                        continue
-                    except Exception as csv_error:
-                        print(f"CSV parsing error for '{sheet_name}' with URL format {i+1}: {csv_error}")
-                        continue
-                else:
-                    print(f"HTTP {response.status_code} for '{sheet_name}' with URL format {i+1}")
-                    continue
+                df = self._parse_csv_response(sheet_name, i + 1, response.status_code, response.text)
+                if df is not None:
+                    return df
                     
             except Exception as e:
                 print(f"Request error for '{sheet_name}' with URL format {i+1}: {e}")
@@ -75,6 +96,42 @@ class GoogleSheetsService:
         print(f"All URL formats failed for Google Sheet '{sheet_name}'")
         return None
     
+    async def _fetch_first_valid(self, sheet_name: str, urls: List[str]) -> Optional[pd.DataFrame]:
+        """
+        Request all URL formats concurrently and return the first one, in list order, that yields valid CSV
+        """
+        async with httpx.AsyncClient(timeout=10) as client:
+            async def fetch(fmt: int, url: str):
+                return fmt, await client.get(url)
+            
+            tasks = [asyncio.create_task(fetch(i + 1, url)) for i, url in enumerate(urls)]
+            try:
+                # Formats differ in which sheet they return, so keep the sequential precedence
+                # rather than taking whichever response arrives first
+                for task in tasks:
+                    try:
+                        fmt, response = await task
+                    except Exception as e:
+                        print(f"Request error for '{sheet_name}': {e}")
+                        continue
+                    df = self._parse_csv_response(sheet_name, fmt, response.status_code, response.text)
+                    if df is not None:
+                        return df
+            finally:
+                # Cancel the requests that are no longer needed before the client is closed
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+        
+        print(f"All URL formats failed for Google Sheet '{sheet_name}'")
+        return None
+    
+    async def read_sheet_as_csv_async(self, sheet_name: str) -> Optional[pd.DataFrame]:
+        """
+        Async variant of read_sheet_as_csv that tries all URL formats in parallel
+        """
+        return await self._fetch_first_valid(sheet_name, self._csv_urls(sheet_name))
+    
     def read_sheet_with_gspread(self, sheet_name: str) -> Optional[pd.DataFrame]:
         """
         Alternative method using gspread for public sheets
@@ -107,26 +164,100 @@ class GoogleSheetsService:
             print(f"Error reading with gspread '{sheet_name}': {e}")
             return None
     
-    def get_sheet_data(self, sheet_name: str) -> Optional[pd.DataFrame]:
+    # If the primary sheet cannot be read, try these alternative sheet names
+    alternative_names = {
+        "Items": ["ItemsRecipies", "Sheet1"],
+        "Recipes": ["ItemsRecipies", "Sheet2"],
+    }
+    
+    def _get_cached(self, sheet_name: str) -> Optional[pd.DataFrame]:
+        ts, df = self._cache.get(sheet_name, (0.0, None))
+        if df is not None and time.monotonic() - ts < self._ttl:
+            print(f"Using cached data for Google Sheet '{sheet_name}'")
+            return df.copy()
+        return None
+    
+    def _set_cached(self, sheet_name: str, df: pd.DataFrame) -> pd.DataFrame:
+        self._cache[sheet_name] = (time.monotonic(), df)
+        self.stale_sheets.discard(sheet_name)
+        self._write_disk_cache(sheet_name, df)
+        return df.copy()
+    
+    def _disk_cache_path(self, sheet_name: str) -> Path:
+        return self.cache_dir / f"{sheet_name}.parquet"
+    
+    def _read_disk_cache(self, sheet_name: str) -> Optional[pd.DataFrame]:
+        path = self._disk_cache_path(sheet_name)
+        try:
+            if not path.exists() or time.time() - path.stat().st_mtime >= self._disk_ttl:
+                return None
+            df = pd.read_parquet(path)
+        except Exception as e:
+            print(f"Error reading cached Google Sheet '{sheet_name}' from {path}: {e}")
+            return None
+        print(f"Using disk-cached data for Google Sheet '{sheet_name}' from {path}")
+        self._cache[sheet_name] = (time.monotonic(), df)
+        self.stale_sheets.add(sheet_name)
+        return df.copy()
+    
+    def _write_disk_cache(self, sheet_name: str, df: pd.DataFrame):
+        path = self._disk_cache_path(sheet_name)
+        tmp_path = path.with_suffix(".parquet.tmp")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first so a crash never leaves a truncated cache behind
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Error caching Google Sheet '{sheet_name}' to {path}: {e}")
+    
+    def invalidate(self, sheet_name: Optional[str] = None):
+        """Drop the cached copies of a sheet, or of every sheet if no name is given"""
+        names = list(self._cache) if sheet_name is None else [sheet_name]
+        if sheet_name is None:
+            self._cache.clear()
+            names += [path.stem for path in self.cache_dir.glob("*.parquet")]
+        else:
+            self._cache.pop(sheet_name, None)
+        # Remove the disk copies too, otherwise the next read would serve them again
+        for name in set(names):
+            self._disk_cache_path(name).unlink(missing_ok=True)
+    
+    def get_sheet_data(self, sheet_name: str, force_refresh: bool = False) -> Optional[pd.DataFrame]:
         """
         Get sheet data, trying multiple methods
         """
+        if not force_refresh:
+            cached = self._get_cached(sheet_name)
+            if cached is None:
+                cached = self._read_disk_cache(sheet_name)
+            if cached is not None:
+                return cached
+        
         # Try CSV export first (most reliable for public sheets)
-        df = self.read_sheet_as_csv(sheet_name)
+        for name in [sheet_name, *self.alternative_names.get(sheet_name, [])]:
+            df = self.read_sheet_as_csv(name)
+            if df is not None and not df.empty:
+                return self._set_cached(sheet_name, df)
         
-        if df is not None and not df.empty:
-            return df
-            
-        # If CSV fails, try alternative sheet names
-        alternative_names = {
-            "Items": ["ItemsRecipies", "Sheet1"],
-            "Recipes": ["ItemsRecipies", "Sheet2"],
-        }
+        print(f"Could not read sheet '{sheet_name}' from Google Sheets")
+        return None
+    
+    async def get_sheet_data_async(self, sheet_name: str, force_refresh: bool = False) -> Optional[pd.DataFrame]:
+        """
+        Async variant of get_sheet_data
+        """
+        if not force_refresh:
+            cached = self._get_cached(sheet_name)
+            if cached is None:
+                cached = await asyncio.to_thread(self._read_disk_cache, sheet_name)
+            if cached is not None:
+                return cached
         
-        for alt_name in alternative_names.get(sheet_name, []):
-            df = self.read_sheet_as_csv(alt_name)
+        for name in [sheet_name, *self.alternative_names.get(sheet_name, [])]:
+            df = await self.read_sheet_as_csv_async(name)
             if df is not None and not df.empty:
-                return df
+                return await asyncio.to_thread(self._set_cached, sheet_name, df)
         
         print(f"Could not read sheet '{sheet_name}' from Google Sheets")
         return None
@@ -139,6 +270,14 @@ class GoogleSheetsService:
         """Get recipes data from Google Sheets"""
         return self.get_sheet_data("Recipes")
     
+    async def get_items_data_async(self, force_refresh: bool = False) -> Optional[pd.DataFrame]:
+        """Get items data from Google Sheets without blocking the event loop"""
+        return await self.get_sheet_data_async("Items", force_refresh)
+    
+    async def get_recipes_data_async(self, force_refresh: bool = False) -> Optional[pd.DataFrame]:
+        """Get recipes data from Google Sheets without blocking the event loop"""
+        return await self.get_sheet_data_async("Recipes", force_refresh)
+    
     def debug_sheet_access(self) -> Dict[str, Any]:
         """Debug method to check what's available in the Google Sheet"""
         debug_info = {